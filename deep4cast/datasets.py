@@ -34,21 +34,20 @@ class TimeSeriesDataset(Dataset):
         self.static_covs = static_covs
 
         # Slice each time series into examples, assigning IDs to each
-        last_id = 0
-        n_dropped = 0
-        self.example_ids = {}
-        for i, ts in enumerate(self.time_series):
-            num_examples = (ts.shape[-1] - self.lookback - self.horizon + self.step) // self.step
-            # Time series shorter than the forecast horizon need to be dropped.
-            if ts.shape[-1] < self.horizon:
-                n_dropped += 1
-                continue
-            # For short time series zero pad the input
-            if ts.shape[-1] < self.lookback + self.horizon:
-                num_examples = 1
-            for j in range(num_examples):
-                self.example_ids[last_id + j] = (i, j * self.step)
-            last_id += num_examples
+        lengths = np.array([ts.shape[-1] for ts in self.time_series], dtype=int)
+        num_examples = (lengths - self.lookback - self.horizon + self.step) // self.step
+        # For short time series zero pad the input
+        num_examples[lengths < self.lookback + self.horizon] = 1
+        # Time series shorter than the forecast horizon need to be dropped.
+        dropped = lengths < self.horizon
+        num_examples[dropped] = 0
+        n_dropped = np.sum(dropped)
+
+        # Example IDs index rows of (time series index, lookback start)
+        ts_ids = np.repeat(np.arange(len(lengths)), num_examples)
+        first_ids = np.repeat(np.cumsum(num_examples) - num_examples, num_examples)
+        lookback_ids = (np.arange(len(ts_ids)) - first_ids) * self.step
+        self.example_ids = np.stack([ts_ids, lookback_ids], axis=1)
 
         # Inform user about time series that were too short
         if n_dropped > 0:
@@ -58,7 +57,7 @@ class TimeSeriesDataset(Dataset):
                  )
 
         # Store the number of training examples
-        self._len = int(self.example_ids.__len__() * thinning)
+        self._len = int(len(self.example_ids) * thinning)
 
     def __len__(self):
         return self._len
@@ -1,4 +1,3 @@
-import copy
 import time
 
 import numpy as np
@@ -17,6 +16,7 @@ class Forecaster():
         * device (str): Device used for training (`cpu` or `cuda`).
         * checkpoint_path (str): File system path for writing model checkpoints.
         * verbose (bool): Verbosity of forecaster.
+        * compile_model (bool): Compile the model with ``torch.compile`` (requires PyTorch 2.0).
     
     """
     def __init__(self,
@@ -26,7 +26,8 @@ class Forecaster():
                  n_epochs=1,
                  device='cpu',
                  checkpoint_path='./',
-                 verbose=True):
+                 verbose=True,
+                 compile_model=False):
         self.device = device if torch.cuda.is_available() and 'cuda' in device else 'cpu'
         self.model = model.to(device)
         self.optimizer = optimizer
@@ -36,6 +37,14 @@ class Forecaster():
         self.checkpoint_path = checkpoint_path
         self.verbose = verbose
 
+        # Forward passes go through the compiled module, while checkpoints
+        # keep the plain model
+        self._forward = self.model
+        if compile_model:
+            if not hasattr(torch, 'compile'):
+                raise ValueError('Compiling the model requires PyTorch 2.0.')
+            self._forward = torch.compile(self.model)
+
     def fit(self,
             dataloader_train,
             dataloader_val=None,
@@ -79,7 +88,7 @@ class Forecaster():
 
             # Backpropagation
             self.optimizer.zero_grad()
-            outputs = self.model(inputs)
+            outputs = self._forward(inputs)
             reg = outputs.pop('regularizer')
             loss = -self.loss(**outputs).log_prob(targets).mean() + reg
             if torch.isnan(loss.mean()):
@@ -113,81 +122,174 @@ class Forecaster():
                     end=""
                 )            
 
-    def _evaluate(self, dataloader, n_samples=10):
-        """Returns the approximate min negative log likelihood of the model 
-        averaged over dataset.
+    def _evaluate(self, dataloader):
+        """Returns the negative log likelihood of the model averaged over
+        dataset.
 
         Arguments:
             * dataloader (``torch.utils.data.DataLoader``): Evaluation data.
-            * n_samples (int): Number of forecast samples.
         
         """
-        max_llikelihood = [0]*n_samples
+        llikelihood = 0
         with torch.no_grad():
             for batch in dataloader:
                 inputs = batch['X'].to(self.device)
                 targets = batch['y'].to(self.device)
                 
                 # Forward pass through the model
-                outputs = self.model(inputs)
+                outputs = self._forward(inputs)
                 outputs.pop('regularizer')
                 
-                # Calculate loss (typically probability density)    
-                for i in range(n_samples):
-                    loss = self.loss(**outputs).log_prob(targets) 
-                    max_llikelihood[i] += loss.sum().item()
-            max_llikelihood = np.max(max_llikelihood)
+                # Calculate loss (typically probability density)
+                llikelihood += self.loss(**outputs).log_prob(targets).sum().item()
             
-        return -max_llikelihood / len(dataloader.dataset)
+        return -llikelihood / len(dataloader.dataset)
 
-    def predict(self, dataloader, n_samples=100) -> np.array:
+    def predict(self, dataloader, n_samples=100, chunk_size=1) -> np.array:
         """Generates predictions.
 
+        Samples are drawn ``chunk_size`` at a time, each chunk in a single
+        forward pass, so memory use grows with ``chunk_size`` times the batch
+        size.
+
         Arguments:
             * dataloader (``torch.utils.data.DataLoader``): Data to make forecasts.
             * n_samples (int): Number of forecast samples.
+            * chunk_size (int): Number of forecast samples drawn per forward pass.
         
         """
         with torch.no_grad():
             predictions = []
             for batch in dataloader:
-                inputs = batch['X'].to(self.device)
                 samples = []
-                for i in range(n_samples):
-                    outputs = self.model(inputs)
-                    outputs.pop('regularizer')
-                    outputs = self.loss(**outputs).sample((1,)).cpu()
-                    batch['y'] = outputs[0]
-                    outputs = copy.deepcopy(batch)
-                    outputs = dataloader.dataset.transform.untransform(outputs)
-                    samples.append(outputs['y'][None, :])
+                for start in range(0, n_samples, chunk_size):
+                    samples.append(
+                        self._sample(
+                            batch,
+                            dataloader.dataset.transform,
+                            min(chunk_size, n_samples - start)
+                        )
+                    )
                 samples = np.concatenate(samples, axis=0)
                 predictions.append(samples)
             predictions = np.concatenate(predictions, axis=1)
 
         return predictions
 
-    def embed(self, dataloader, n_samples=100) -> np.array:
+    def predict_moments(self, dataloader, n_samples=100, chunk_size=1) -> dict:
+        """Generates the mean and standard deviation of forecast samples
+        without keeping all samples in memory.
+
+        Samples are drawn ``chunk_size`` at a time and merged into running
+        moments, so memory use grows with ``chunk_size`` instead of
+        ``n_samples``.
+
+        Arguments:
+            * dataloader (``torch.utils.data.DataLoader``): Data to make forecasts.
+            * n_samples (int): Number of forecast samples.
+            * chunk_size (int): Number of forecast samples drawn per forward pass.
+
+        """
+        if n_samples < 1:
+            raise ValueError('n_samples must be at least 1.')
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1.')
+
+        with torch.no_grad():
+            means, stds = [], []
+            for batch in dataloader:
+                count, mean, m2 = 0, 0.0, 0.0
+                for start in range(0, n_samples, chunk_size):
+                    samples = self._sample(
+                        batch,
+                        dataloader.dataset.transform,
+                        min(chunk_size, n_samples - start)
+                    )
+
+                    # Merge chunk moments into the running moments
+                    n_chunk = len(samples)
+                    chunk_mean = samples.mean(axis=0)
+                    chunk_m2 = np.square(samples - chunk_mean).sum(axis=0)
+                    delta = chunk_mean - mean
+                    total = count + n_chunk
+                    mean = mean + delta * n_chunk / total
+                    m2 = m2 + chunk_m2 + np.square(delta) * count * n_chunk / total
+                    count = total
+                means.append(mean)
+                stds.append(np.sqrt(m2 / max(count - 1, 1)))
+
+        return {'mean': np.concatenate(means), 'std': np.concatenate(stds)}
+
+    def embed(self, dataloader, n_samples=100, chunk_size=1) -> np.array:
         """Generate embedding vectors.
 
         Arguments:
             * dataloader (``torch.utils.data.DataLoader``): Data to make embedding vectors.
             * n_samples (int): Number of forecast samples.
+            * chunk_size (int): Number of samples encoded per forward pass.
         
         """
         with torch.no_grad():
             predictions = []
             for batch in dataloader:
-                inputs = batch['X'].to(self.device)
+                batch_size = len(batch['X'])
                 samples = []
-                for i in range(n_samples):
+                for start in range(0, n_samples, chunk_size):
+                    n_chunk = min(chunk_size, n_samples - start)
+                    inputs = batch['X'].repeat(n_chunk, 1, 1).to(self.device)
                     outputs, __ = self.model.encode(inputs)
-                    samples.append(outputs.cpu().numpy())
-                samples = np.array(samples)
+                    outputs = outputs.cpu().numpy()
+                    samples.append(
+                        outputs.reshape((n_chunk, batch_size) + outputs.shape[1:])
+                    )
+                samples = np.concatenate(samples, axis=0)
                 predictions.append(samples)
             predictions = np.concatenate(predictions, axis=1)
 
         return predictions
+
+    def _sample(self, batch, transform, n_samples) -> np.array:
+        """Returns untransformed forecast samples for a single batch, drawn
+        in one forward pass.
+
+        Arguments:
+            * batch (dict): Batch of examples from a ``torch.utils.data.DataLoader``.
+            * transform (``transforms.Compose``): Transformations used to untransform forecasts.
+            * n_samples (int): Number of forecast samples.
+
+        """
+        batch_size = len(batch['X'])
+
+        # Targets are replaced by forecast samples, so skip copying them
+        samples = {key: value for key, value in batch.items() if key != 'y'}
+        samples = self._tile_batch(samples, n_samples)
+        inputs = samples['X'].to(self.device)
+        outputs = self._forward(inputs)
+        outputs.pop('regularizer')
+        samples['y'] = self.loss(**outputs).sample().cpu()
+        samples = transform.untransform(samples)
+        samples = samples['y'].numpy()
+
+        return samples.reshape((n_samples, batch_size) + samples.shape[1:])
+
+    @staticmethod
+    def _tile_batch(batch, n_samples):
+        """Returns a copy of a batch with every tensor repeated ``n_samples``
+        times along the batch dimension. Dropout draws a separate mask for
+        each copy, so one forward pass yields ``n_samples`` samples.
+
+        Arguments:
+            * batch (dict): Batch of examples from a ``torch.utils.data.DataLoader``.
+            * n_samples (int): Number of copies.
+
+        """
+        tiled = {}
+        for key, value in batch.items():
+            if isinstance(value, torch.Tensor):
+                value = value.repeat((n_samples,) + (1,) * (value.dim() - 1))
+            tiled[key] = value
+
+        return tiled
     
     def _save_checkpoint(self):
         """Save a complete PyTorch model checkpoint."""
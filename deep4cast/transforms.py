@@ -176,8 +176,9 @@ class ToTensor(object):
         self.device = torch.device(device)
 
     def __call__(self, sample):
-        sample['X'] = torch.tensor(sample['X'], device=self.device).float()
-        sample['y'] = torch.tensor(sample['y'], device=self.device).float()
+        # Cast while copying so that each example is only copied once
+        sample['X'] = torch.tensor(sample['X'], dtype=torch.float, device=self.device)
+        sample['y'] = torch.tensor(sample['y'], dtype=torch.float, device=self.device)
 
         return sample
 
@@ -226,12 +227,12 @@ class Standardize(object):
 
         # Remove mean from X and y and rescale by standard deviation
         if self.targets:
-            mean = X[self.targets, :].mean(dim=1)
-            std = X[self.targets, :].std(dim=1)
-            X[self.targets, :] -= mean[:, None]
-            X[self.targets, :] /= std[:, None]
-            y[self.targets, :] -= mean[:, None]
-            y[self.targets, :] /= std[:, None]
+            # Gather the target rows once and write them back in one pass
+            X_targets = X[self.targets, :]
+            mean = X_targets.mean(dim=1)
+            std = X_targets.std(dim=1)
+            X[self.targets, :] = (X_targets - mean[:, None]) / std[:, None]
+            y[self.targets, :] = (y[self.targets, :] - mean[:, None]) / std[:, None]
         else:
             mean = X.mean(dim=1)
             std = X.std(dim=1)